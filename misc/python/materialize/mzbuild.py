@@ -17,6 +17,7 @@ documentation][user-docs].
 
 import argparse
 import base64
+import copy
 import hashlib
 import json
 import os
@@ -29,13 +30,46 @@ from collections import OrderedDict
 from functools import lru_cache
 from pathlib import Path
 from tempfile import TemporaryFile
-from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+from typing import (
+    IO,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Type,
+)
 
 import yaml
 
 from materialize import cargo, git, rustc_flags, spawn, ui, xcompile
 from materialize.xcompile import Arch
 
+# The libyaml-backed loader is much faster than the pure-Python one, but is
+# only available if PyYAML was built with libyaml support.
+_YAML_LOADER: Type[Any]
+if yaml.__with_libyaml__:
+    _YAML_LOADER = yaml.CSafeLoader
+else:
+    _YAML_LOADER = yaml.SafeLoader
+
+
+@lru_cache(maxsize=None)
+def _parse_yaml(path: Path, mtime_ns: int) -> Any:
+    with open(path, "rb") as f:
+        return yaml.load(f, Loader=_YAML_LOADER)
+
+
+def _load_yaml(path: Path) -> Any:
+    """Load a YAML file, reusing the previous parse if the file is unchanged.
+
+    The caller receives its own copy of the data and may modify it freely.
+    """
+    return copy.deepcopy(_parse_yaml(path, path.stat().st_mtime_ns))
+
 
 class Fingerprint(bytes):
     """A SHA-1 hash of the inputs to an `Image`.
@@ -356,23 +390,22 @@ class Image:
         self.rd = rd
         self.path = path
         self.pre_images: List[PreImage] = []
-        with open(self.path / "mzbuild.yml") as f:
-            data = yaml.safe_load(f)
-            self.name: str = data.pop("name")
-            self.publish: bool = data.pop("publish", True)
-            self.description: Optional[str] = data.pop("description", None)
-            self.mainline: bool = data.pop("mainline", True)
-            for pre_image in data.pop("pre-image", []):
-                typ = pre_image.pop("type", None)
-                if typ == "cargo-build":
-                    self.pre_images.append(CargoBuild(self.rd, self.path, pre_image))
-                elif typ == "copy":
-                    self.pre_images.append(Copy(self.rd, self.path, pre_image))
-                else:
-                    raise ValueError(
-                        f"mzbuild config in {self.path} has unknown pre-image type"
-                    )
-            self.build_args = data.pop("build-args", {})
+        data = _load_yaml(self.path / "mzbuild.yml")
+        self.name: str = data.pop("name")
+        self.publish: bool = data.pop("publish", True)
+        self.description: Optional[str] = data.pop("description", None)
+        self.mainline: bool = data.pop("mainline", True)
+        for pre_image in data.pop("pre-image", []):
+            typ = pre_image.pop("type", None)
+            if typ == "cargo-build":
+                self.pre_images.append(CargoBuild(self.rd, self.path, pre_image))
+            elif typ == "copy":
+                self.pre_images.append(Copy(self.rd, self.path, pre_image))
+            else:
+                raise ValueError(
+                    f"mzbuild config in {self.path} has unknown pre-image type"
+                )
+        self.build_args = data.pop("build-args", {})
 
         if re.search(r"[^A-Za-z0-9\-]", self.name):
             raise ValueError(
@@ -642,7 +675,9 @@ class DependencySet:
         The provided `dependencies` must be topologically sorted.
         """
         self._dependencies: Dict[str, ResolvedImage] = {}
-        known_images = docker_images()
+        dependencies = list(dependencies)
+        # Avoid shelling out to Docker if there is nothing to look up.
+        known_images = docker_images() if dependencies else set()
         for d in dependencies:
             image = ResolvedImage(
                 image=d,
@@ -16,25 +16,34 @@ documentation][user-docs].
 """
 
 import argparse
-import copy
 import importlib
 import importlib.abc
 import importlib.util
 import inspect
+import json
 import os
+import re
+import shutil
+import socket
 import subprocess
 import sys
 import time
 import traceback
-from contextlib import contextmanager
+from contextlib import contextmanager, suppress
 from dataclasses import dataclass
-from inspect import getmembers, isfunction
+from functools import lru_cache
+from inspect import isfunction
+from itertools import zip_longest
+from pathlib import Path
 from ssl import SSLContext
 from tempfile import TemporaryFile
+from types import ModuleType
 from typing import (
+    IO,
     Any,
     Callable,
     Dict,
+    FrozenSet,
     Iterable,
     Iterator,
     List,
@@ -42,7 +51,9 @@ from typing import (
     Optional,
     OrderedDict,
     Sequence,
+    Set,
     Tuple,
+    Type,
     TypedDict,
     TypeVar,
     Union,
@@ -50,9 +61,9 @@ from typing import (
 )
 
 import pg8000
-import sqlparse
 import yaml
 from pg8000 import Connection, Cursor
+from pg8000.exceptions import DatabaseError
 
 from materialize import mzbuild, spawn, ui
 from materialize.mzcompose import loader
@@ -61,6 +72,16 @@ from materialize.ui import UIError
 T = TypeVar("T")
 say = ui.speaker("C> ")
 
+# Render compositions with the libyaml bindings when PyYAML was built with
+# them, as they are several times faster than the pure-Python implementation.
+# Compositions only contain plain dicts, lists, and scalars, so the safe
+# dumper suffices.
+_YAML_DUMPER: Type[Any]
+if yaml.__with_libyaml__:
+    _YAML_DUMPER = yaml.CSafeDumper
+else:
+    _YAML_DUMPER = yaml.SafeDumper
+
 
 class UnknownCompositionError(UIError):
     """The specified composition was unknown."""
@@ -69,11 +90,156 @@ class UnknownCompositionError(UIError):
         super().__init__(f"unknown composition {name!r}")
 
 
+@dataclass
+class _LoadedModule:
+    """An executed mzcompose.py file."""
+
+    mtime_ns: int
+    size: int
+    module: ModuleType
+    description: Optional[str]
+    workflows: Dict[str, Callable[..., None]]
+
+
+# Image tags that may refer to different images over time.
+_VARIABLE_IMAGE_TAGS = (":latest", ":unstable", ":rolling")
+
+# The `docker compose` subcommands that cannot change which containers exist
+# or what state they are in, beyond the one-off containers created by `run`.
+_STATE_PRESERVING_COMMANDS = {"exec", "logs", "port", "ps", "pull", "run"}
+
+# Executed mzcompose.py files, keyed by path, in least-recently-used order.
+_MODULE_CACHE: OrderedDict[Path, _LoadedModule] = OrderedDict()
+_MODULE_CACHE_SIZE = 100
+
+
+def _load_module(mzcompose_py: Path, composition_path: Path) -> _LoadedModule:
+    """Execute an mzcompose.py file, reusing the result of a previous execution
+    if the file has not changed since."""
+    stat = mzcompose_py.stat()
+    cached = _MODULE_CACHE.get(mzcompose_py)
+    if cached and (cached.mtime_ns, cached.size) == (stat.st_mtime_ns, stat.st_size):
+        _MODULE_CACHE.move_to_end(mzcompose_py)
+        return cached
+
+    spec = importlib.util.spec_from_file_location("mzcompose", mzcompose_py)
+    assert spec
+    module = importlib.util.module_from_spec(spec)
+    assert isinstance(spec.loader, importlib.abc.Loader)
+    loader.composition_path = composition_path
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        loader.composition_path = None
+
+    workflows: Dict[str, Callable[..., None]] = {}
+    # Walk the module's namespace directly rather than using
+    # `inspect.getmembers`, which sorts and inspects every attribute.
+    for name, fn in vars(module).items():
+        if name.startswith("workflow_") and isfunction(fn):
+            # The name of the workflow is the name of the function
+            # with the "workflow_" prefix stripped and any underscores
+            # replaced with dashes.
+            name = name[len("workflow_") :].replace("_", "-")
+            workflows[name] = fn
+
+    loaded = _LoadedModule(
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+        module=module,
+        description=inspect.getdoc(module),
+        workflows=workflows,
+    )
+    _MODULE_CACHE[mzcompose_py] = loaded
+    _MODULE_CACHE.move_to_end(mzcompose_py)
+    while len(_MODULE_CACHE) > _MODULE_CACHE_SIZE:
+        _MODULE_CACHE.popitem(last=False)
+    return loaded
+
+
+_SQL_STATEMENT_RE = re.compile(
+    r"""
+    (?:
+        [Ee]'(?:[^'\\]|\\.|'')*'            # escape string literal
+      | '(?:[^']|'')*'                      # string literal
+      | "(?:[^"]|"")*"                      # quoted identifier
+      | \$(?P<tag>\w*)\$.*?\$(?P=tag)\$       # dollar-quoted string
+      | --[^\n]*                            # line comment
+      | /\*.*?\*/                           # block comment
+      # Anything else. Words are matched whole, so that only a standalone E
+      # introduces an escape string literal.
+      | \w+
+      | [^;'"$/\-\w]+
+      | [^;]
+    )+
+    # The terminating semicolon, plus any comment on the same line.
+    (?:;(?:[ \t]*--[^\n]*)?)?
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+
+def _split_sql(sql: str) -> Iterator[str]:
+    r"""Split a string into individual SQL statements.
+
+    Semicolons within string literals, quoted identifiers, dollar-quoted
+    strings, and comments do not terminate a statement.
+
+    >>> list(_split_sql("SELECT 1; SELECT ';'; -- done"))
+    ['SELECT 1;', "SELECT ';'; -- done"]
+    >>> list(_split_sql("CREATE TABLE t (a int);  SELECT $x$a;b$x$ "))
+    ['CREATE TABLE t (a int);', 'SELECT $x$a;b$x$']
+    >>> list(_split_sql(r"SELECT E'it\'s;'; SELECT time';'"))
+    ["SELECT E'it\\'s;';", "SELECT time';'"]
+    """
+    for match in _SQL_STATEMENT_RE.finditer(sql):
+        statement = match.group().strip()
+        if statement:
+            yield statement
+
+
+@lru_cache(maxsize=None)
+def _docker_executable() -> str:
+    """Return the absolute path to the `docker` executable.
+
+    Handing `subprocess` an absolute path allows it to launch the process with
+    `posix_spawn` rather than `fork`, which is much cheaper for a large parent
+    process.
+    """
+    return shutil.which("docker") or "docker"
+
+
+@lru_cache(maxsize=512)
+def _workflow_doc(func: Callable[..., None]) -> Optional[str]:
+    """Return the docstring of a workflow function."""
+    return inspect.getdoc(func)
+
+
+@lru_cache(maxsize=512)
+def _workflow_arity(func: Callable[..., None]) -> int:
+    """Return the number of parameters a workflow function accepts."""
+    return len(inspect.signature(func).parameters)
+
+
+def _snapshot(obj: T) -> T:
+    """Deep copy a JSON-compatible object.
+
+    Round-tripping through the C-accelerated `json` module is considerably
+    faster than `copy.deepcopy` for trees of plain dicts, lists, and scalars.
+
+    >>> _snapshot({"ports": [6875], "init": True, "hostname": None})
+    {'ports': [6875], 'init': True, 'hostname': None}
+    """
+    return cast(T, json.loads(json.dumps(obj)))
+
+
 class Composition:
     """A loaded mzcompose.py file."""
 
     @dataclass
     class TestResult:
+        __slots__ = ("duration", "error")
+
         duration: float
         error: Optional[str]
 
@@ -93,13 +259,19 @@ class Composition:
         self.project_name = project_name
         self.silent = silent
         self.workflows: Dict[str, Callable[..., None]] = {}
-        self.test_results: OrderedDict[str, Composition.TestResult] = OrderedDict()
+        self.test_results: Dict[str, Composition.TestResult] = {}
+        # Idle SQL connections, keyed by public port, user, and password.
+        self._sql_connections: Dict[
+            Tuple[int, str, Optional[str]], List[Connection]
+        ] = {}
 
         if name in self.repo.compositions:
             self.path = self.repo.compositions[name]
         else:
             raise UnknownCompositionError(name)
 
+        self._resolved_dependencies: Dict[FrozenSet[str], mzbuild.DependencySet] = {}
+
         self.compose: dict[str, Any] = {
             "version": "3.7",
             "services": {},
@@ -108,27 +280,17 @@ class Composition:
         # Load the mzcompose.py file, if one exists
         mzcompose_py = self.path / "mzcompose.py"
         if mzcompose_py.exists():
-            spec = importlib.util.spec_from_file_location("mzcompose", mzcompose_py)
-            assert spec
-            module = importlib.util.module_from_spec(spec)
-            assert isinstance(spec.loader, importlib.abc.Loader)
-            loader.composition_path = self.path
-            spec.loader.exec_module(module)
-            loader.composition_path = None
-            self.description = inspect.getdoc(module)
-            for name, fn in getmembers(module, isfunction):
-                if name.startswith("workflow_"):
-                    # The name of the workflow is the name of the function
-                    # with the "workflow_" prefix stripped and any underscores
-                    # replaced with dashes.
-                    name = name[len("workflow_") :].replace("_", "-")
-                    self.workflows[name] = fn
-
-            for python_service in getattr(module, "SERVICES", []):
+            loaded = _load_module(mzcompose_py, self.path)
+            self.description = loaded.description
+            self.workflows.update(loaded.workflows)
+
+            for python_service in getattr(loaded.module, "SERVICES", []):
                 name = python_service.name
                 if name in self.compose["services"]:
                     raise UIError(f"service {name!r} specified more than once")
-                self.compose["services"][name] = python_service.config
+                # The module may be shared with other compositions, so take a
+                # copy of the config before `_munge_services` mutates it.
+                self.compose["services"][name] = _snapshot(python_service.config)
 
         # Add default volumes
         self.compose.setdefault("volumes", {}).update(
@@ -146,10 +308,39 @@ class Composition:
             self.dependencies = self._munge_services(self.compose["services"].items())
 
         # Emit the munged configuration to a temporary file so that we can later
-        # pass it to Docker Compose.
-        self.file = TemporaryFile(mode="w")
+        # pass it to Docker Compose. On Linux, use an anonymous in-memory file,
+        # which avoids touching the filesystem entirely.
+        self.file: IO[str]
+        if sys.platform == "linux":
+            self.file = open(os.memfd_create("mzcompose"), "w")
+        else:
+            self.file = TemporaryFile(mode="w")
         os.set_inheritable(self.file.fileno(), True)
-        self._write_compose()
+        # Whether `self.compose` has changed since it was last written to
+        # `self.file`. The file is only written when `invoke` needs it, so
+        # that back-to-back modifications are rendered once.
+        self._compose_dirty = True
+        # The services whose dependencies have been brought up to date by
+        # `run` since the composition or its containers last changed.
+        self._services_up_to_date: Set[str] = set()
+        # The private port of each service that `default_port` has looked up.
+        self._default_private_ports: Dict[str, str] = {}
+
+    def _resolve_dependencies(
+        self, images: List[mzbuild.Image]
+    ) -> mzbuild.DependencySet:
+        """Resolve the dependencies of the specified images.
+
+        Resolution requires fingerprinting every input of every image, so the
+        result is remembered for each distinct set of images. `override` is
+        frequently called with the same services over and over.
+        """
+        key = frozenset(image.name for image in images)
+        deps = self._resolved_dependencies.get(key)
+        if deps is None:
+            deps = self.repo.resolve_dependencies(images)
+            self._resolved_dependencies[key] = deps
+        return deps
 
     def _munge_services(
         self, services: List[Tuple[str, dict]]
@@ -170,23 +361,25 @@ class Composition:
                     config["user"] = f"{os.getuid()}:{os.getgid()}"
                 del config["propagate_uid_gid"]
 
-            ports = config.setdefault("ports", [])
+            # Normalize ports to strings, so that they only need to be
+            # stringified once.
+            ports = [str(port) for port in config.get("ports", [])]
+            config["ports"] = ports
+            allow_host_ports = config.pop("allow_host_ports", False)
             for i, port in enumerate(ports):
-                if self.preserve_ports and not ":" in str(port):
+                host_bound = ":" in port
+                if self.preserve_ports and not host_bound:
                     # If preserving ports, bind the container port to the same
                     # host port, assuming the host port is available.
                     ports[i] = f"{port}:{port}"
-                elif ":" in str(port) and not config.get("allow_host_ports", False):
+                elif host_bound and not allow_host_ports:
                     # Raise an error for host-bound ports, unless
                     # `allow_host_ports` is `True`
                     raise UIError(
-                        "programming error: disallowed host port in service {name!r}",
+                        f"programming error: disallowed host port in service {name!r}",
                         hint='Add `"allow_host_ports": True` to the service config to disable this check.',
                     )
 
-            if "allow_host_ports" in config:
-                config.pop("allow_host_ports")
-
             if self.repo.rd.coverage:
                 coverage_volume = "./coverage:/coverage"
                 if coverage_volume not in config.get("volumes", []):
@@ -200,28 +393,58 @@ class Composition:
                 llvm_profile_file = (
                     f"LLVM_PROFILE_FILE=/coverage/{name}-%p-%9m%c.profraw"
                 )
-                for i, env in enumerate(config.get("environment", [])):
-                    # Make sure we don't have duplicate environment entries.
-                    if env.startswith("LLVM_PROFILE_FILE="):
-                        config["environment"][i] = llvm_profile_file
-                        break
+                # Make sure we don't have duplicate environment entries.
+                environment = config.setdefault("environment", [])
+                idx = next(
+                    (
+                        i
+                        for i, env in enumerate(environment)
+                        if env.startswith("LLVM_PROFILE_FILE=")
+                    ),
+                    -1,
+                )
+                if idx >= 0:
+                    environment[idx] = llvm_profile_file
                 else:
-                    config.setdefault("environment", []).append(llvm_profile_file)
+                    environment.append(llvm_profile_file)
 
         # Determine mzbuild specs and inject them into services accordingly.
-        deps = self.repo.resolve_dependencies(images)
-        for _name, config in services:
-            if "mzbuild" in config:
-                config["image"] = deps[config["mzbuild"]].spec()
-                del config["mzbuild"]
+        deps = self._resolve_dependencies(images)
+        if images:
+            for _name, config in services:
+                if "mzbuild" in config:
+                    config["image"] = deps[config["mzbuild"]].spec()
+                    del config["mzbuild"]
 
         return deps
 
+    def _compose_changed(self) -> None:
+        """Note that `self.compose` has been modified.
+
+        Callers that modify `self.compose` must call this method. The
+        composition is re-rendered before the next `docker compose`
+        invocation.
+        """
+        self._compose_dirty = True
+        self._services_up_to_date.clear()
+        self._default_private_ports.clear()
+
     def _write_compose(self) -> None:
+        # Only re-render the composition if it has been modified since it was
+        # last written.
+        if not self._compose_dirty:
+            return
         self.file.seek(0)
         self.file.truncate()
-        yaml.dump(self.compose, self.file)
+        yaml.dump(
+            self.compose,
+            self.file,
+            Dumper=_YAML_DUMPER,
+            default_flow_style=False,
+            sort_keys=False,
+        )
         self.file.flush()
+        self._compose_dirty = False
 
     def invoke(
         self,
@@ -243,6 +466,10 @@ class Composition:
         if not self.silent:
             print(f"$ docker compose {' '.join(args)}", file=sys.stderr)
 
+        if not args or args[0] not in _STATE_PRESERVING_COMMANDS:
+            self._services_up_to_date.clear()
+
+        self._write_compose()
         self.file.seek(0)
 
         stdout = None
@@ -258,7 +485,7 @@ class Composition:
         try:
             return subprocess.run(
                 [
-                    "docker",
+                    _docker_executable(),
                     "compose",
                     f"-f/dev/fd/{self.file.fileno()}",
                     "--project-directory",
@@ -302,10 +529,13 @@ class Composition:
         Args:
             service: The name of a service in the composition.
         """
-        ports = self.compose["services"][service]["ports"]
-        if not ports:
-            raise UIError(f"service f{service!r} does not expose any ports")
-        private_port = str(ports[0]).split(":")[-1]
+        private_port = self._default_private_ports.get(service)
+        if private_port is None:
+            ports = self.compose["services"][service]["ports"]
+            if not ports:
+                raise UIError(f"service f{service!r} does not expose any ports")
+            private_port = str(ports[0]).split(":")[-1]
+            self._default_private_ports[service] = private_port
         return self.port(service, private_port)
 
     def workflow(self, name: str, *args: str) -> None:
@@ -319,10 +549,10 @@ class Composition:
         """
         ui.header(f"Running workflow {name}")
         func = self.workflows[name]
-        parser = WorkflowArgumentParser(name, inspect.getdoc(func), list(args))
+        parser = WorkflowArgumentParser(name, _workflow_doc(func), list(args))
         try:
             loader.composition_path = self.path
-            if len(inspect.signature(func).parameters) > 1:
+            if _workflow_arity(func) > 1:
                 func(self, parser)
             else:
                 # If the workflow doesn't have an `args` parameter, parse them here
@@ -348,30 +578,49 @@ class Composition:
         `mzcompose down`, which makes debugging or inspecting the composition
         challenging.
         """
-        # Remember the old composition.
-        old_compose = copy.deepcopy(self.compose)
+        # Remember the old definitions of the overridden services. Service
+        # definitions are replaced wholesale rather than mutated, so there is
+        # no need to copy them.
+        old_services = {
+            service.name: self.compose["services"].get(service.name)
+            for service in services
+        }
 
-        # Update the composition with the new service definitions.
-        deps = self._munge_services([(s.name, cast(dict, s.config)) for s in services])
-        for service in services:
-            self.compose["services"][service.name] = service.config
+        # Update the composition with the new service definitions. Munging
+        # modifies the definitions, so work on copies: the services may be
+        # shared with other compositions loaded from the same module.
+        new_services = [(s.name, cast(dict, _snapshot(s.config))) for s in services]
+        deps = self._munge_services(new_services)
+        for name, config in new_services:
+            self.compose["services"][name] = config
+        self._compose_changed()
 
         # Re-acquire dependencies, as the override may have swapped an `image`
-        # config for an `mzbuild` config.
-        deps.acquire()
-
-        self._write_compose()
+        # config for an `mzbuild` config. This is only necessary if the
+        # override actually changed the image of any service; the images of
+        # the existing definitions have already been acquired.
+        changed_images = [
+            name
+            for name, config in new_services
+            if config.get("image") != (old_services[name] or {}).get("image")
+        ]
+        if changed_images:
+            deps.acquire()
 
         # Ensure image freshness
-        self.pull_if_variable([service.name for service in services])
+        self.pull_if_variable(changed_images)
 
         try:
             # Run the next composition.
             yield
         finally:
             # Restore the old composition.
-            self.compose = old_compose
-            self._write_compose()
+            for name, old_config in old_services.items():
+                if old_config is None:
+                    self.compose["services"].pop(name, None)
+                else:
+                    self.compose["services"][name] = old_config
+            self._compose_changed()
 
     @contextmanager
     def test_case(self, name: str) -> Iterator[None]:
@@ -449,6 +698,61 @@ class Composition:
         conn = self.sql_connection(service, user, port, password)
         return conn.cursor()
 
+    @contextmanager
+    def _pooled_sql_cursor(
+        self,
+        service: str,
+        user: str,
+        port: Optional[int],
+        password: Optional[str],
+    ) -> Iterator[Cursor]:
+        """Borrow a cursor on a pooled connection to the specified service.
+
+        Connections are reset with `DISCARD ALL` when they are taken from the
+        pool, which also weeds out connections that were severed by a
+        container restart. A connection is only returned to the pool if the
+        body of the `with` block succeeds; otherwise it is closed.
+        """
+        port = self.port(service, port) if port else self.default_port(service)
+        pool = self._sql_connections.setdefault((port, user, password), [])
+        conn = None
+        while conn is None:
+            # Checking for an idle connection and taking it must be a single
+            # step, since other threads may be drawing from the same pool.
+            try:
+                conn = pool.pop()
+            except IndexError:
+                break
+            try:
+                conn.run("DISCARD ALL")
+            except Exception:
+                with suppress(Exception):
+                    conn.close()
+                conn = None
+        if conn is None:
+            conn = pg8000.connect(
+                host="localhost", user=user, password=password, port=port
+            )
+            conn.autocommit = True
+
+        try:
+            with conn.cursor() as cursor:
+                yield cursor
+            # Don't leave a transaction opened by the caller dangling.
+            conn.rollback()
+        except BaseException:
+            with suppress(Exception):
+                conn.close()
+            raise
+        pool.append(conn)
+
+    def close_connections(self) -> None:
+        """Close all pooled SQL connections opened by `sql` and `sql_query`."""
+        for pool in self._sql_connections.values():
+            while pool:
+                with suppress(Exception):
+                    pool.pop().close()
+
     def sql(
         self,
         sql: str,
@@ -458,13 +762,19 @@ class Composition:
         password: Optional[str] = None,
         print_statement: bool = True,
     ) -> None:
-        """Run a batch of SQL statements against the materialized service."""
-        with self.sql_cursor(
-            service=service, user=user, port=port, password=password
-        ) as cursor:
-            for statement in sqlparse.split(sql):
-                if print_statement:
-                    print(f"> {statement}")
+        """Run a batch of SQL statements against the materialized service.
+
+        If `print_statement` is true, the statements are printed and executed
+        one at a time. Otherwise the entire batch is sent to the server in a
+        single round trip, in which case the server executes the statements
+        in an implicit transaction, as for any multi-statement simple query.
+        """
+        with self._pooled_sql_cursor(service, user, port, password) as cursor:
+            if not print_statement:
+                cursor.execute(sql)
+                return
+            for statement in _split_sql(sql):
+                print(f"> {statement}")
                 cursor.execute(statement)
 
     def sql_query(
@@ -475,7 +785,7 @@ class Composition:
         password: Optional[str] = None,
     ) -> Any:
         """Execute and return results of a SQL query."""
-        with self.sql_cursor(service=service, user=user, password=password) as cursor:
+        with self._pooled_sql_cursor(service, user, None, password) as cursor:
             cursor.execute(sql)
             return cursor.fetchall()
 
@@ -512,7 +822,11 @@ class Composition:
         # Restart any dependencies whose definitions have changed. The trick,
         # taken from Buildkite's Docker Compose plugin, is to run an `up`
         # command that requests zero instances of the requested service.
-        self.invoke("up", "--detach", "--scale", f"{service}=0", service)
+        # That is only necessary if the composition or its containers have
+        # changed since the last time we did so.
+        if service not in self._services_up_to_date:
+            self.invoke("up", "--detach", "--scale", f"{service}=0", service)
+            self._services_up_to_date.add(service)
         return self.invoke(
             "run",
             *(["--entrypoint", entrypoint] if entrypoint else []),
@@ -573,12 +887,16 @@ class Composition:
             services: List of service names
         """
 
+        to_pull = []
         for service in services:
-            if "image" in self.compose["services"][service] and any(
-                self.compose["services"][service]["image"].endswith(tag)
-                for tag in [":latest", ":unstable", ":rolling"]
-            ):
-                self.invoke("pull", service)
+            config = self.compose["services"][service]
+            if "image" in config and config["image"].endswith(_VARIABLE_IMAGE_TAGS):
+                to_pull.append(service)
+        # Pull all images with a single command, which lets Docker Compose
+        # pull them in parallel. Note that `docker compose pull` without any
+        # service arguments would pull the images for *all* services.
+        if to_pull:
+            self.invoke("pull", *to_pull)
 
     def up(
         self,
@@ -600,23 +918,33 @@ class Composition:
                 `sleep infinity` so that additional commands can be scheduled
                 on the container with `Composition.exec`.
         """
+        # Only the entrypoint and command of each service are modified, so
+        # only those need to be remembered.
+        old_commands: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
         if persistent:
-            old_compose = copy.deepcopy(self.compose)
             for service in self.compose["services"].values():
+                old = {
+                    k: service.pop(k) for k in ("entrypoint", "command") if k in service
+                }
+                old_commands.append((service, old))
                 service["entrypoint"] = ["sleep", "infinity"]
                 service["command"] = []
-            self._write_compose()
+            self._compose_changed()
 
-        self.invoke(
-            "up",
-            *(["--detach"] if detach else []),
-            *(["--wait"] if wait else []),
-            *services,
-        )
-
-        if persistent:
-            self.compose = old_compose
-            self._write_compose()
+        try:
+            self.invoke(
+                "up",
+                *(["--detach"] if detach else []),
+                *(["--wait"] if wait else []),
+                *services,
+            )
+        finally:
+            if persistent:
+                for service, old in old_commands:
+                    service.pop("entrypoint")
+                    service.pop("command")
+                    service.update(old)
+                self._compose_changed()
 
     def down(self, destroy_volumes: bool = True, remove_orphans: bool = True) -> None:
         """Stop and remove resources.
@@ -627,6 +955,7 @@ class Composition:
             destroy_volumes: Remove named volumes and anonymous volumes attached
                 to containers.
         """
+        self.close_connections()
         self.invoke(
             "down",
             *(["--volumes"] if destroy_volumes else []),
@@ -875,17 +1204,21 @@ class ServiceConfig(TypedDict, total=False):
     """Restart policy."""
 
 
+@dataclass(eq=False, repr=False)
 class Service:
     """A Docker Compose service in a `Composition`.
 
     Attributes:
         name: The name of the service.
-        config: The definition of the service.
+        config: The definition of the service. The definition must consist
+            only of JSON-compatible values, i.e., dicts, lists, strings,
+            numbers, booleans, and `None`.
     """
 
-    def __init__(self, name: str, config: ServiceConfig) -> None:
-        self.name = name
-        self.config = config
+    __slots__ = ("name", "config")
+
+    name: str
+    config: ServiceConfig
 
 
 class WorkflowArgumentParser(argparse.ArgumentParser):
@@ -912,28 +1245,48 @@ class WorkflowArgumentParser(argparse.ArgumentParser):
 
 
 # TODO(benesch): replace with Docker health checks.
-def _check_tcp(
-    cmd: List[str], host: str, port: int, timeout_secs: int, kind: str = ""
-) -> List[str]:
-    cmd.extend(
-        [
-            "timeout",
-            str(timeout_secs),
-            "bash",
-            "-c",
-            f"until [ cat < /dev/null > /dev/tcp/{host}/{port} ] ; do sleep 0.1 ; done",
-        ]
-    )
-    try:
-        spawn.capture(cmd, stderr=subprocess.STDOUT)
-    except subprocess.CalledProcessError as e:
-        ui.log_in_automation(
-            "wait-for-tcp ({}{}:{}): error running {}: {}, stdout:\n{}\nstderr:\n{}".format(
-                kind, host, port, ui.shell_quote(cmd), e, e.stdout, e.stderr
-            )
-        )
-        raise
-    return cmd
+def _check_tcp(host: str, port: int, timeout_secs: int, kind: str = "") -> None:
+    """Wait for a TCP port to accept connections."""
+    error = None
+    for remaining in ui.timeout_loop(timeout_secs, tick=0.05):
+        try:
+            with socket.create_connection(
+                (host, port), timeout=min(1.0, max(remaining, 0.05))
+            ):
+                return
+        except OSError as e:
+            error = e
+    ui.log_in_automation(f"wait-for-tcp ({kind}{host}:{port}): error: {error}")
+    raise UIError(f"{kind}{host}:{port} never accepted connections: {error}")
+
+
+_WAIT_FOR_PG_MIN_DELAY = 0.025
+_WAIT_FOR_PG_MAX_DELAY = 1.0
+
+
+def _match_rows(rows: Iterable[Any], expected: Iterable[Any]) -> Tuple[List[Any], bool]:
+    """Compare `rows` against `expected`, stopping at the first mismatch.
+
+    Returns the rows consumed, followed by any rows that remain after a
+    mismatch, and whether the rows matched.
+
+    >>> _match_rows(iter([[1], [2]]), [[1], [2]])
+    ([[1], [2]], True)
+    >>> _match_rows(iter([[1], [3], [4]]), [[1], [2]])
+    ([[1], [3], [4]], False)
+    >>> _match_rows(iter([[1]]), [[1], [2]])
+    ([[1]], False)
+    """
+    rows = iter(rows)
+    result = []
+    missing = object()
+    for got, want in zip_longest(rows, expected, fillvalue=missing):
+        if got is not missing:
+            result.append(got)
+        if got != want:
+            result.extend(rows)
+            return result, False
+    return result, True
 
 
 # TODO(benesch): replace with Docker health checks.
@@ -952,39 +1305,118 @@ def _wait_for_pg(
     """Wait for a pg-compatible database (includes materialized)"""
     obfuscated_password = password[0:1] if password is not None else ""
     args = f"dbname={dbname} host={host} port={port} user={user} password='{obfuscated_password}...'"
-    ui.progress(f"waiting for {args} to handle {query!r}", "C")
-    error = None
-    for remaining in ui.timeout_loop(timeout_secs, tick=0.5):
-        try:
-            conn = pg8000.connect(
-                database=dbname,
-                host=host,
-                port=port,
-                user=user,
-                password=password,
-                timeout=1,
-                ssl_context=ssl_context,
-            )
-            # The default (autocommit = false) wraps everything in a transaction.
-            conn.autocommit = True
-            cur = conn.cursor()
-            cur.execute(query)
-            if expected == "any" and cur.rowcount == -1:
-                ui.progress(" success!", finish=True)
-                return
-            result = list(cur.fetchall())
-            if expected == "any" or result == expected:
-                if print_result:
-                    say(f"query result: {result}")
+    ui.progress(f"waiting for {args} to handle {query!r}", prefix="C")
+    # The most recent error, and the error raised by the most recent attempt.
+    error: Optional[Exception] = None
+    attempt_error: Optional[Exception] = None
+    # Poll quickly at first, so that we notice promptly if the database comes
+    # up quickly, then back off exponentially so that we don't hammer a
+    # database that is slow to start.
+    delay = _WAIT_FOR_PG_MIN_DELAY
+    deadline = time.monotonic() + timeout_secs
+    # The connection is reused across attempts, so that a database that
+    # accepts connections but is not yet ready to answer the query does not
+    # cost a full connection handshake per attempt.
+    conn: Optional[Connection] = None
+    # The statement to run on each attempt against the current connection.
+    # Once a connection is used for a second attempt, the query is prepared,
+    # so that repeated probes skip parsing and planning. A probe that succeeds
+    # straight away doesn't pay for the extra round trip. Only single
+    # statements are prepared: PREPARE would silently run any further
+    # statements just once.
+    statement = query
+    can_prepare = len(list(_split_sql(query))) == 1
+    prepare = False
+    # The (seconds remaining, error type) last reported, so that progress is
+    # only reported when it changes rather than on every attempt.
+    last_progress: Optional[Tuple[int, Type[Exception]]] = None
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            previous_attempt_error, attempt_error = attempt_error, None
+            try:
+                if conn is None:
+                    conn = pg8000.connect(
+                        database=dbname,
+                        host=host,
+                        port=port,
+                        user=user,
+                        password=password,
+                        timeout=1,
+                        ssl_context=ssl_context,
+                    )
+                    # The default (autocommit = false) wraps everything in a
+                    # transaction.
+                    conn.autocommit = True
+                    statement = query
+                    prepare = can_prepare
+                elif prepare:
+                    prepare = False
+                    try:
+                        conn.cursor().execute(f"PREPARE _mz_probe AS {query}")
+                        statement = "EXECUTE _mz_probe"
+                    except DatabaseError:
+                        # Not every statement can be prepared; fall back to
+                        # running the query directly.
+                        pass
+                cur = conn.cursor()
+                cur.execute(statement)
+                # Statements that don't return rows, like DDL, have no
+                # description, and fetching from them raises.
+                returns_rows = cur.description is not None
+                if expected == "any":
+                    # Any result will do, so only fetch the rows if we need
+                    # to print them.
+                    if print_result and returns_rows and cur.rowcount != -1:
+                        say(f"query result: {list(cur.fetchall())}")
+                    else:
+                        ui.progress(" success!", finish=True)
+                    return
+                if returns_rows:
+                    result, matched = _match_rows(cur, expected)
                 else:
-                    ui.progress(" success!", finish=True)
-                return
-            else:
-                say(
-                    f"host={host} port={port} did not return rows matching {expected} got: {result}"
-                )
-        except Exception as e:
-            ui.progress(f"{e if print_result else ''} {int(remaining)}")
-            error = e
+                    result, matched = _match_rows([], expected)
+                if matched:
+                    if print_result:
+                        say(f"query result: {result}")
+                    else:
+                        ui.progress(" success!", finish=True)
+                    return
+                else:
+                    say(
+                        f"host={host} port={port} did not return rows matching {expected} got: {result}"
+                    )
+            except Exception as e:
+                progress = (int(remaining), type(e))
+                if progress != last_progress:
+                    ui.progress("%s %d", e if print_result else "", progress[0])
+                    last_progress = progress
+                error = attempt_error = e
+                # The database rejecting the query leaves the session usable,
+                # as it runs in autocommit mode, but any other error may mean
+                # the connection is broken; start afresh next time.
+                if conn is not None and not isinstance(e, DatabaseError):
+                    with suppress(Exception):
+                        conn.close()
+                    conn = None
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if isinstance(attempt_error, DatabaseError) and not isinstance(
+                previous_attempt_error, DatabaseError
+            ):
+                # The database is accepting connections but rejected the
+                # query, which is often a transient condition while it
+                # finishes starting up. Retry once immediately before backing
+                # off.
+                delay = _WAIT_FOR_PG_MIN_DELAY
+                continue
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, _WAIT_FOR_PG_MAX_DELAY)
+    finally:
+        if conn is not None:
+            with suppress(Exception):
+                conn.close()
     ui.progress(finish=True)
     raise UIError(f"never got correct result for {args}: {error}")
@@ -44,6 +44,8 @@ DEFAULT_MZ_ENVIRONMENT_ID = "mzcompose-test-00000000-0000-0000-0000-000000000000
 
 
 class Materialized(Service):
+    __slots__ = ("default_storage_size", "default_replica_size")
+
     class Size:
         DEFAULT_SIZE = 4
 
@@ -232,6 +234,8 @@ class Materialized(Service):
 
 
 class Clusterd(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "clusterd",
@@ -277,6 +281,8 @@ class Clusterd(Service):
 
 
 class Zookeeper(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "zookeeper",
@@ -303,6 +309,8 @@ class Zookeeper(Service):
 
 
 class Kafka(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "kafka",
@@ -358,6 +366,8 @@ class Kafka(Service):
 
 
 class Redpanda(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "redpanda",
@@ -418,6 +428,8 @@ class Redpanda(Service):
 
 
 class SchemaRegistry(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "schema-registry",
@@ -466,6 +478,8 @@ class SchemaRegistry(Service):
 
 
 class MySql(Service):
+    __slots__ = ()
+
     DEFAULT_ROOT_PASSWORD = "p@ssw0rd"
 
     def __init__(
@@ -505,6 +519,8 @@ class MySql(Service):
 
 
 class Cockroach(Service):
+    __slots__ = ()
+
     DEFAULT_COCKROACH_TAG = "v23.1.1"
 
     def __init__(
@@ -561,6 +577,8 @@ class Cockroach(Service):
 
 
 class Postgres(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "postgres",
@@ -597,6 +615,8 @@ class Postgres(Service):
 
 
 class SqlServer(Service):
+    __slots__ = ("sa_password",)
+
     DEFAULT_SA_PASSWORD = "RPSsql12345"
 
     def __init__(
@@ -626,6 +646,8 @@ class SqlServer(Service):
 
 
 class Debezium(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "debezium",
@@ -672,6 +694,8 @@ class Debezium(Service):
 
 
 class Toxiproxy(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "toxiproxy",
@@ -698,6 +722,8 @@ class Squid(Service):
     traffic via the proxy.
     """
 
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "squid",
@@ -712,6 +738,8 @@ class Squid(Service):
 
 
 class Localstack(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "localstack",
@@ -738,6 +766,8 @@ class Localstack(Service):
 
 
 class Minio(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "minio",
@@ -773,6 +803,8 @@ class Minio(Service):
 
 
 class Testdrive(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "testdrive",
@@ -884,6 +916,8 @@ class Testdrive(Service):
 
 
 class TestCerts(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "test-certs",
@@ -902,6 +936,8 @@ class TestCerts(Service):
 
 
 class SqlLogicTest(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "sqllogictest",
@@ -926,6 +962,8 @@ class SqlLogicTest(Service):
 
 
 class Kgen(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "kgen",
@@ -951,6 +989,8 @@ class Kgen(Service):
 
 
 class Metabase(Service):
+    __slots__ = ()
+
     def __init__(self, name: str = "metabase") -> None:
         super().__init__(
             name=name,
@@ -967,6 +1007,8 @@ class Metabase(Service):
 
 
 class SshBastionHost(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         name: str = "ssh-bastion-host",
@@ -999,6 +1041,8 @@ class SshBastionHost(Service):
 
 
 class Mz(Service):
+    __slots__ = ()
+
     def __init__(
         self,
         *,
@@ -1044,6 +1088,8 @@ class Mz(Service):
 
 
 class Prometheus(Service):
+    __slots__ = ()
+
     def __init__(self, name: str = "prometheus") -> None:
         super().__init__(
             name=name,
@@ -1060,6 +1106,8 @@ class Prometheus(Service):
 
 
 class Grafana(Service):
+    __slots__ = ()
+
     def __init__(self, name: str = "grafana") -> None:
         super().__init__(
             name=name,
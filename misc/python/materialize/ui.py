@@ -73,9 +73,15 @@ def confirm(question: str) -> bool:
 
 
 def progress(
-    msg: str = "", prefix: Optional[str] = None, *, finish: bool = False
+    msg: str = "", *args: Any, prefix: Optional[str] = None, finish: bool = False
 ) -> None:
-    """Print a progress message to stderr, using the same prefix format as speaker"""
+    """Print a progress message to stderr, using the same prefix format as speaker
+
+    If `args` are provided, `msg` is formatted with them using `%`-style
+    formatting, so that callers need not build the message themselves.
+    """
+    if args:
+        msg = msg % args
     if prefix is not None:
         msg = f"{prefix}> {msg}"
     end = "" if not finish else "\n"
@@ -9,20 +9,23 @@
 
 from ssl import SSLContext
 from types import TracebackType
-from typing import IO, Any, AnyStr, ContextManager, Deque, Optional, Sequence
+from typing import IO, Any, AnyStr, ContextManager, Deque, Iterator, Optional, Sequence
 
 class Connection:
     autocommit: bool
     notices: Deque
     def cursor(self) -> Cursor: ...
     def close(self) -> None: ...
-    def run(self, sql: str, stream: Optional[IO[AnyStr]]) -> None: ...
+    def rollback(self) -> None: ...
+    def run(self, sql: str, stream: Optional[IO[AnyStr]] = ...) -> None: ...
 
 class Cursor(ContextManager):
     rowcount: int
+    description: Optional[Sequence[Sequence[Any]]]
     def execute(self, sql: str) -> None: ...
     def fetchall(self) -> Sequence[Sequence[Any]]: ...
     def fetchone(self) -> Sequence[Any]: ...
+    def __iter__(self) -> Iterator[Sequence[Any]]: ...
     def __exit__(
         self,
         typ: Optional[type[BaseException]],